@@ -15,6 +15,8 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import time
+
 import RPi.GPIO as gpio
 
 
@@ -56,6 +58,14 @@ class RpiGpioBackend:
         elif state == self.STATE_LOW:
             gpio.output(channel, 0)
 
+    def pulse(self, channel, state, duration):
+        # Set the output to the given state for the given duration in seconds,
+        # then to the opposite state. Backends with hardware or kernel
+        # support for one-shot pulses can implement this without blocking.
+        self.set_output(channel, state)
+        time.sleep(duration)
+        self.set_output(channel, self.STATE_LOW if state == self.STATE_HIGH else self.STATE_HIGH)
+
     def get_input(self, channel):
         state = gpio.input(channel)
         if state:
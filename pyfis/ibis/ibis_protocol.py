@@ -217,8 +217,11 @@ class IBISProtocol:
         As in send_telegram
         """
         
+        # Bind the format method once instead of looking it up on every call
+        format_telegram = fmt.format
+        
         def _send(*args):
-            return self.send_telegram(fmt.format(*args),
+            return self.send_telegram(format_telegram(*args),
                 reply_length = reply_length)
         
         return _send
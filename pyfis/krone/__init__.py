@@ -20,3 +20,4 @@ from .k9000_fbk import Krone9000FBK
 from .k9000_hlst import Krone9000HLST
 from .k8200 import Krone8200Display
 from .k8200_pst import Krone8200PST
+from .k8200_async import AsyncKrone8200Display
@@ -18,6 +18,11 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import serial
 import time
 
+from contextlib import contextmanager
+from functools import reduce
+from itertools import chain
+from operator import xor
+
 from .exceptions import CommunicationError
 from ..utils.base_serial import BaseSerialPort
 
@@ -41,6 +46,11 @@ class Krone8200Display:
     ACK1 = (DLE, 0x31)
     WABT = (DLE, 0x3F)
 
+    # Maximum time to wait for the first byte of a response
+    RESPONSE_TIMEOUT = 3.0
+    # Time to wait before repeating a request after a WABT response
+    WAIT_INTERVAL = 3.0
+
     SIDE_BOTH = 0
     SIDE_A = 1
     SIDE_B = 2
@@ -56,8 +66,26 @@ class Krone8200Display:
         PAD: "PAD"
     }
 
-    def __init__(self, port, address, debug = False, exclusive = True, is_board = False):
+    # Two-digit decimal representation of all unit addresses and positions
+    _D2 = tuple(b"%02d" % i for i in range(100))
+
+    # Parity-adjusted value for all byte values: Bit 7 is set
+    # if the byte has an odd number of 1 bits and cleared otherwise
+    PARITY_TABLE = bytes((b | 0x80) if bin(b).count("1") % 2 else (b & 0x7F) for b in range(256))
+
+    # Lookup table to strip the parity bit from received bytes
+    STRIP_PARITY_TABLE = bytes(b & 0x7F for b in range(256))
+
+    def __init__(self, port, address, debug = False, exclusive = True, is_board = False, min_rx_delay = 0):
         """
+        port: Serial port name or an already opened serial port object.
+              Pass the same port object to share it between several
+              controllers on the same bus.
+        min_rx_delay: Additional delay in seconds between sending a request
+              and reading the response, for stations that need it.
+              By default, the response is read as soon as the request
+              has been transmitted.
+
         Note on the is_board parameter: If this is True, pyFIS will not add
         any PAD bytes to the messages. This is - for some reason - required
         to control "board" style displays, i.e. displays using a firmware
@@ -66,77 +94,143 @@ class Krone8200Display:
         """
         self.debug = debug
         self.is_board = is_board
+        self.min_rx_delay = min_rx_delay
+        # Set while the station is kept addressed, see addressed()
+        self._addressed = False
         if isinstance(port, serial.Serial) or isinstance(port, BaseSerialPort):
             self.port = port
         else:
-            self.port = serial.Serial(port, baudrate=2400, timeout=1.0, exclusive=exclusive)
+            self.port = serial.Serial(port, baudrate=2400, timeout=1.0, write_timeout=1.0, exclusive=exclusive)
         # To enable receiving responses (DTR coupled to Rx via optocoupler)
         self.port.setDTR(1)
         # Set Rx address
         self.rx_address = address
         # Tx address is 1 byte less
         self.tx_address = (address[0]-1, address[1]-1)
+        # Fixed frames only depend on the address,
+        # so they are built and parity-encoded only once
+        if self.is_board:
+            rx_enq = [self.EOT, self.rx_address[0], self.rx_address[1], self.ENQ]
+            tx_enq = [self.EOT, self.tx_address[0], self.tx_address[1], self.ENQ]
+        else:
+            rx_enq = [self.PAD, self.EOT, self.PAD, self.rx_address[0], self.rx_address[1], self.ENQ, self.PAD]
+            tx_enq = [self.PAD, self.EOT, self.PAD, self.tx_address[0], self.tx_address[1], self.ENQ, self.PAD]
+        self._rx_enq_frame = bytes(rx_enq).translate(self.PARITY_TABLE)
+        self._tx_enq_frame = bytes(tx_enq).translate(self.PARITY_TABLE)
+        self._end_comm_frame = bytes((self.PAD, self.EOT, self.PAD)).translate(self.PARITY_TABLE)
+        self._ack0_frame = bytes((self.PAD, self.DLE, self.ACK0[1], self.PAD)).translate(self.PARITY_TABLE)
+        # Readable representation of every byte value for debug_message,
+        # including the separating space and ignoring the parity bit
+        self._debug_table = []
+        for byte in range(256):
+            byte &= 0x7F
+            if byte in self.DEBUG_CHARS:
+                self._debug_table.append(self.DEBUG_CHARS[byte] + " ")
+            elif byte < 32 or byte == 127:
+                self._debug_table.append("<{:02X}> ".format(byte))
+            else:
+                self._debug_table.append(chr(byte) + " ")
 
     def make_parity(self, byte):
-        result = byte
-        num_ones = 0
-        for n in range(8):
-            if (byte >> n) & 1:
-                num_ones += 1
-        if num_ones % 2 != 0:
-            result |= 0x80
-        else:
-            result &= 0x7F
-        return result
+        return self.PARITY_TABLE[byte & 0xFF]
 
     def make_lrc(self, data):
-        lrc = 0x7F
-        for b in data:
-            lrc ^= b
-        return lrc
+        width = len(data)
+        if width < 256:
+            return reduce(xor, data, 0x7F)
+        # For long messages, repeatedly XOR the upper half of the message
+        # onto the lower half as one big integer until one byte is left
+        lrc = int.from_bytes(bytes(data), "little")
+        while width > 1:
+            half = (width + 1) // 2
+            lrc = (lrc & ((1 << (half * 8)) - 1)) ^ (lrc >> (half * 8))
+            width = half
+        return lrc ^ 0x7F
 
     def debug_message(self, message):
         """
         Turn a message into a readable form
         """
-        result = ""
-        for byte in message:
-            byte &= 0x7F
-            if byte in self.DEBUG_CHARS:
-                result += self.DEBUG_CHARS[byte]
-            elif byte in range(0, 32) or byte == 127:
-                result += "<{:02X}>".format(byte)
-            else:
-                result += chr(byte)
-            result += " "
-        return result
+        return "".join(map(self._debug_table.__getitem__, message))
 
-    def read_response(self):
+    def _build_d2_command(self, prefix, values, auto_update = False):
         """
-        Read the response from the addressed station
+        Build a command consisting of the given prefix followed by
+        the given values as two-digit decimal numbers,
+        optionally followed by the update command
         """
-        timeout = 0.0
-        while not self.port.inWaiting():
-            time.sleep(0.1)
-            timeout += 0.1
-            if timeout >= 3.0:
-                raise CommunicationError("No response received from display")
-        response = self.port.read(self.port.inWaiting())
-
-        while True:
-            time.sleep(0.1)
-            in_waiting = self.port.inWaiting()
-            if not in_waiting:
-                break
-            response += self.port.read(in_waiting)
+        d2 = self._D2
+        parts = [prefix]
+        parts.extend([d2[v] if 0 <= v < 100 else "{:>02}".format(v).encode("ascii") for v in values])
+        if auto_update:
+            parts.append(b"@A")
+        return b"".join(parts)
 
+    def read_response(self, length = None):
+        """
+        Read the response from the addressed station
+        length: Expected length of the response including the leading PAD.
+                If not given, the length is determined from the framing
+                of the response. Either way, reading returns as soon as
+                the complete response has been received.
+        """
+        # Make sure the request has been transmitted completely
+        self.port.flush()
+        if self.min_rx_delay:
+            time.sleep(self.min_rx_delay)
+
+        with self._bounded_read_timeout():
+            # Block until the first byte arrives instead of polling
+            deadline = time.monotonic() + self.RESPONSE_TIMEOUT
+            response = self.port.read(1)
+            while not response:
+                if time.monotonic() >= deadline:
+                    raise CommunicationError("No response received from display")
+                response = self.port.read(1)
+
+            if length is not None:
+                response += self.port.read(length - 1)
+            else:
+                response += self.port.read(1)
+                if len(response) == 2 and response[1] & 0x7F == self.STX:
+                    # Data block, followed by LRC and PAD
+                    response += self.port.read_until(bytes((self.PARITY_TABLE[self.ETX],)))
+                    response += self.port.read(2)
+                elif len(response) == 2 and response[1] & 0x7F == self.DLE:
+                    # ACK0, ACK1 or WABT
+                    response += self.port.read(1)
+
+        return self._check_response(response)
+
+    @contextmanager
+    def _bounded_read_timeout(self):
+        """
+        read_response relies on the port timeout to return from reads.
+        Ports without a finite, non-zero timeout (e.g. shared port objects)
+        would block forever or busy-wait, so their timeout is set to
+        RESPONSE_TIMEOUT while reading and restored afterwards.
+        """
+        port_timeout = self.port.timeout
+        if port_timeout:
+            yield
+            return
+        self.port.timeout = self.RESPONSE_TIMEOUT
+        try:
+            yield
+        finally:
+            self.port.timeout = port_timeout
+
+    def _check_response(self, response):
+        """
+        Validate a received response and strip the parity bits and leading PAD
+        """
         if self.debug:
             print("RX: " + self.debug_message(response))
 
         if not response:
             raise CommunicationError("No response received from display")
 
-        response = [byte & 0x7F for byte in response] # Strip checksum bit; TODO: Actually check it
+        response = response.translate(self.STRIP_PARITY_TABLE) # Strip checksum bit; TODO: Actually check it
 
         if response[0] != self.PAD:
             raise CommunicationError("First byte of response should be PAD, was " + self.debug_message(response[0:1]))
@@ -144,46 +238,42 @@ class Krone8200Display:
         if len(response) >= 2 and response[1] == self.NAK:
             raise CommunicationError("NAK response")
 
-        return response[1:] # Strip leading PAD
+        return list(response[1:]) # Strip leading PAD
 
     def read_response_and_handle_wait(self, tx=False):
-        response = self.read_response()
+        # Responses to Rx requests and commands are always PAD + ACK/WABT,
+        # the length of Tx responses depends on the data being sent
+        length = None if tx else 1 + len(self.ACK0)
+        response = self.read_response(length)
         wait_count = 0
         while self.check_response_wait(response):
             wait_count += 1
             if wait_count >= 3:
                 self.send_end_comm()
                 raise CommunicationError("Maximum wait retries exceeded")
-            time.sleep(3)
-            if tx:
-                self.send_raw_message([self.PAD, self.EOT, self.PAD, self.tx_address[0], self.tx_address[1], self.ENQ, self.PAD])
-            else:
-                self.send_raw_message([self.PAD, self.EOT, self.PAD, self.rx_address[0], self.rx_address[1], self.ENQ, self.PAD])
-            response = self.read_response()
+            time.sleep(self.WAIT_INTERVAL)
+            self._write_frame(self._tx_enq_frame if tx else self._rx_enq_frame)
+            response = self.read_response(length)
         return response
 
-    def send_raw_message(self, message):
-        for i, byte in enumerate(message):
-            message[i] = self.make_parity(byte)
+    def _write_frame(self, frame):
+        """
+        Write an already parity-encoded frame
+        """
         if self.debug:
-            print("TX: " + self.debug_message(message))
-        self.port.write(bytearray(message))
+            print("TX: " + self.debug_message(frame))
+        self.port.write(frame)
+
+    def send_raw_message(self, message):
+        self._write_frame(bytes(message).translate(self.PARITY_TABLE))
 
     def send_rx_request(self):
-        if self.is_board:
-            self.send_raw_message([self.EOT, self.rx_address[0], self.rx_address[1], self.ENQ])
-        else:
-            self.send_raw_message([self.PAD, self.EOT, self.PAD, self.rx_address[0], self.rx_address[1], self.ENQ, self.PAD])
-        time.sleep(0.2)
+        self._write_frame(self._rx_enq_frame)
         response = self.read_response_and_handle_wait(tx=False)
         return self.check_response_ack(response)
 
     def send_tx_request(self):
-        if self.is_board:
-            self.send_raw_message([self.EOT, self.tx_address[0], self.tx_address[1], self.ENQ])
-        else:
-            self.send_raw_message([self.PAD, self.EOT, self.PAD, self.tx_address[0], self.tx_address[1], self.ENQ, self.PAD])
-        time.sleep(0.5)
+        self._write_frame(self._tx_enq_frame)
         response = self.read_response_and_handle_wait(tx=True)
         return response
 
@@ -201,38 +291,65 @@ class Krone8200Display:
     def send_message(self, message):
         """
         Send a message. Requires the station to be addressed with send_comm_request before.
+        message: str or bytes
         """
-        data = [self.STX] + list(map(ord, message)) + [self.ETX]
-        cmd = [self.PAD] + data
-        cmd.append(self.make_lrc(data[1:]))
-        cmd.append(self.PAD)
-        self.send_raw_message(cmd)
+        if isinstance(message, str):
+            message = message.encode("latin-1")
+        # The LRC covers everything after STX, up to and including ETX
+        data = message + bytes((self.ETX,))
+        frame = bytes((self.PAD, self.STX)) + data + bytes((self.make_lrc(data), self.PAD))
+        self._write_frame(frame.translate(self.PARITY_TABLE))
 
     def send_end_comm(self):
-        self.send_raw_message([self.PAD, self.EOT, self.PAD])
+        self._write_frame(self._end_comm_frame)
 
     def send_ack0(self):
-        self.send_raw_message([self.PAD, self.DLE, 0x30, self.PAD])
+        self._write_frame(self._ack0_frame)
 
     def send_command(self, address, side, command):
         """
         Send a simple command
         """
-        if not self.send_rx_request():
+        if not self._addressed and not self.send_rx_request():
             return False
-        self.send_message("{address:>02}{side:>01}{command}".format(address=address, side=side, command=command))
-        time.sleep(0.2)
+        if isinstance(command, str):
+            command = command.encode("latin-1")
+        self.send_message("{address:>02}{side:>01}".format(address=address, side=side).encode("ascii") + command)
 
         response = self.read_response_and_handle_wait(tx=False)
         if not self.check_response_ack(response):
             return False
-        self.send_end_comm()
+        if not self._addressed:
+            self.send_end_comm()
         return True
 
+    @contextmanager
+    def addressed(self):
+        """
+        Keep the station addressed for several commands.
+        Within the with block, send_command and all methods based on it
+        skip the addressing and end of communication handshake,
+        which is done only once when entering and leaving the block.
+        Commands which return data (read_status, read_positions)
+        can't be used within the block and raise CommunicationError.
+        """
+        if not self.send_rx_request():
+            raise CommunicationError("Station did not acknowledge addressing")
+        self._addressed = True
+        try:
+            yield self
+        finally:
+            self._addressed = False
+            self.send_end_comm()
+
     def send_command_with_response(self, address, side, command):
         """
         Send a command and retrieve the response data
         """
+        if self._addressed:
+            # Reading the response needs a Tx ENQ, which would
+            # break the Rx addressing kept up by addressed()
+            raise CommunicationError("Commands with response data can't be sent within addressed()")
         if not self.send_command(address, side, command):
             return None
         return self.send_tx_request()
@@ -248,9 +365,7 @@ class Krone8200Display:
         Set all units with sequential addressing
         positions: list of positions for units starting at address 1
         """
-        command = "C" + "".join(["{:>02}".format(p) for p in positions])
-        if auto_update:
-            command += "@A"
+        command = self._build_d2_command(b"C", positions, auto_update)
         return self.send_command(address, side, command)
 
     def set_positions_addressed(self, positions, auto_update = True, address = 1, side = 0):
@@ -258,9 +373,7 @@ class Krone8200Display:
         Set all units with explicit addressing
         positions: dict of format {address: position}
         """
-        command = "E" + "".join(["{a:>02}{p:>02}".format(a=a, p=p) for a, p in positions.items()])
-        if auto_update:
-            command += "@A"
+        command = self._build_d2_command(b"E", chain.from_iterable(positions.items()), auto_update)
         return self.send_command(address, side, command)
 
     def update(self, address = 1, side = 0):
@@ -275,9 +388,7 @@ class Krone8200Display:
         unit: unit address which controls the light
         state: 1 or 0
         """
-        command = "Z{:02d}{:02d}".format(unit, state)
-        if auto_update:
-            command += "@A"
+        command = self._build_d2_command(b"Z", (unit, state), auto_update)
         return self.send_command(address, side, command)
 
     def set_blinker(self, unit, state, auto_update = True, address = 1, side = 0):
@@ -287,9 +398,7 @@ class Krone8200Display:
         state: 0 (lights off), 1 (light 1 on), 2 (light 2 on), 3 (both lights on)
         Needs to be followed by a set_light command
         """
-        command = "B{:02d}{:02d}".format(unit, state)
-        if auto_update:
-            command += "@A"
+        command = self._build_d2_command(b"B", (unit, state), auto_update)
         return self.send_command(address, side, command)
 
     def restart(self, address = 1, side = 0):
@@ -303,7 +412,7 @@ class Krone8200Display:
         Lock the specified units (cause them to ignore input)
         units: unit addresses to be locked
         """
-        command = "S" + "".join(["{:>02}".format(u) for u in units])
+        command = self._build_d2_command(b"S", units)
         return self.send_command(address, side, command)
 
     def unlock_units(self, units, address = 1, side = 0):
@@ -311,7 +420,7 @@ class Krone8200Display:
         Unlock the specified units (cause them to accept input)
         units: unit addresses to be unlocked
         """
-        command = "F" + "".join(["{:>02}".format(u) for u in units])
+        command = self._build_d2_command(b"F", units)
         return self.send_command(address, side, command)
 
     def read_status(self, units, address = 1, side = 0):
@@ -319,7 +428,7 @@ class Krone8200Display:
         Read the status of the specified units.
         units: unit addresses to be read
         """
-        command = "M" + "".join(["{:>02}".format(u) for u in units])
+        command = self._build_d2_command(b"M", units)
         return self.send_command_with_response(address, side, command)
 
     def read_positions(self, units, address = 1, side = 0):
@@ -327,7 +436,7 @@ class Krone8200Display:
         Read the positions of the specified units.
         units: unit addresses to be read
         """
-        command = "L" + "".join(["{:>02}".format(u) for u in units])
+        command = self._build_d2_command(b"L", units)
         return self.send_command_with_response(address, side, command)
 
     def d_set_module_data(self, module_data):
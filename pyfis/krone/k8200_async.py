@@ -0,0 +1,184 @@
+"""
+Copyright 2019 - 2023 Julian Metzler
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import asyncio
+import time
+
+from contextlib import asynccontextmanager
+
+try:
+    import aioserial
+except ImportError:
+    _HAS_AIOSERIAL = False
+else:
+    _HAS_AIOSERIAL = True
+
+from .exceptions import CommunicationError
+from .k8200 import Krone8200Display
+
+
+class AsyncKrone8200Display(Krone8200Display):
+    """
+    asyncio variant of Krone8200Display.
+    All methods communicating with the display are coroutines,
+    so several displays on different buses can be driven concurrently
+    and the time spent waiting for the display is available to other tasks.
+    Requires the aioserial package.
+    """
+
+    def __init__(self, port, address, debug = False, exclusive = True, is_board = False, min_rx_delay = 0):
+        """
+        port: Serial port name or an already opened aioserial.AioSerial object.
+        For the other parameters, see Krone8200Display.
+        """
+        if not _HAS_AIOSERIAL:
+            raise RuntimeError("aioserial is required for AsyncKrone8200Display")
+        if not isinstance(port, aioserial.AioSerial):
+            port = aioserial.AioSerial(port, baudrate=2400, timeout=1.0, write_timeout=1.0, exclusive=exclusive)
+        super().__init__(port, address, debug=debug, exclusive=exclusive, is_board=is_board, min_rx_delay=min_rx_delay)
+
+    async def read_response(self, length = None):
+        """
+        Read the response from the addressed station
+        length: Expected length of the response including the leading PAD.
+                If not given, the length is determined from the framing
+                of the response.
+        """
+        if self.min_rx_delay:
+            await asyncio.sleep(self.min_rx_delay)
+
+        with self._bounded_read_timeout():
+            deadline = time.monotonic() + self.RESPONSE_TIMEOUT
+            response = await self.port.read_async(1)
+            while not response:
+                if time.monotonic() >= deadline:
+                    raise CommunicationError("No response received from display")
+                response = await self.port.read_async(1)
+
+            if length is not None:
+                response += await self.port.read_async(length - 1)
+            else:
+                response += await self.port.read_async(1)
+                if len(response) == 2 and response[1] & 0x7F == self.STX:
+                    # Data block, followed by LRC and PAD
+                    response += await self.port.read_until_async(bytes((self.PARITY_TABLE[self.ETX],)))
+                    response += await self.port.read_async(2)
+                elif len(response) == 2 and response[1] & 0x7F == self.DLE:
+                    # ACK0, ACK1 or WABT
+                    response += await self.port.read_async(1)
+
+        return self._check_response(response)
+
+    async def read_response_and_handle_wait(self, tx=False):
+        length = None if tx else 1 + len(self.ACK0)
+        response = await self.read_response(length)
+        wait_count = 0
+        while self.check_response_wait(response):
+            wait_count += 1
+            if wait_count >= 3:
+                await self.send_end_comm()
+                raise CommunicationError("Maximum wait retries exceeded")
+            await asyncio.sleep(self.WAIT_INTERVAL)
+            await self._write_frame(self._tx_enq_frame if tx else self._rx_enq_frame)
+            response = await self.read_response(length)
+        return response
+
+    async def _write_frame(self, frame):
+        if self.debug:
+            print("TX: " + self.debug_message(frame))
+        await self.port.write_async(frame)
+
+    async def send_raw_message(self, message):
+        await self._write_frame(bytes(message).translate(self.PARITY_TABLE))
+
+    async def send_rx_request(self):
+        await self._write_frame(self._rx_enq_frame)
+        response = await self.read_response_and_handle_wait(tx=False)
+        return self.check_response_ack(response)
+
+    async def send_tx_request(self):
+        await self._write_frame(self._tx_enq_frame)
+        return await self.read_response_and_handle_wait(tx=True)
+
+    async def send_message(self, message):
+        """
+        Send a message. Requires the station to be addressed with send_rx_request before.
+        message: str or bytes
+        """
+        if isinstance(message, str):
+            message = message.encode("latin-1")
+        data = message + bytes((self.ETX,))
+        frame = bytes((self.PAD, self.STX)) + data + bytes((self.make_lrc(data), self.PAD))
+        await self._write_frame(frame.translate(self.PARITY_TABLE))
+
+    async def send_end_comm(self):
+        await self._write_frame(self._end_comm_frame)
+
+    async def send_ack0(self):
+        await self._write_frame(self._ack0_frame)
+
+    async def send_command(self, address, side, command):
+        """
+        Send a simple command
+        """
+        if not self._addressed and not await self.send_rx_request():
+            return False
+        if isinstance(command, str):
+            command = command.encode("latin-1")
+        await self.send_message("{address:>02}{side:>01}".format(address=address, side=side).encode("ascii") + command)
+
+        response = await self.read_response_and_handle_wait(tx=False)
+        if not self.check_response_ack(response):
+            return False
+        if not self._addressed:
+            await self.send_end_comm()
+        return True
+
+    @asynccontextmanager
+    async def addressed(self):
+        """
+        Keep the station addressed for several commands,
+        see Krone8200Display.addressed. Use with async with.
+        """
+        if not await self.send_rx_request():
+            raise CommunicationError("Station did not acknowledge addressing")
+        self._addressed = True
+        try:
+            yield self
+        finally:
+            self._addressed = False
+            await self.send_end_comm()
+
+    async def send_command_with_response(self, address, side, command):
+        """
+        Send a command and retrieve the response data
+        """
+        if self._addressed:
+            # See Krone8200Display.send_command_with_response
+            raise CommunicationError("Commands with response data can't be sent within addressed()")
+        if not await self.send_command(address, side, command):
+            return None
+        return await self.send_tx_request()
+
+    # The command methods (set_positions etc.) are inherited unchanged,
+    # they return the coroutine from send_command which needs to be awaited.
+
+    async def d_set_module_data(self, module_data):
+        await self.set_positions_addressed(dict(module_data), auto_update=True)
+
+    async def d_update(self):
+        pass
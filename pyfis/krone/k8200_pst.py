@@ -28,14 +28,24 @@ class Krone8200PST:
     Controls the PST bus in a Krone 8200 split-flap display.
     """
 
-    def __init__(self, port, nmi_backend, nmi_channel, nmi_invert, debug = False, exclusive = True):
+    # BCD representation of all two-digit positions
+    _BCD = bytes(int_to_bcd(i) for i in range(100))
+
+    def __init__(self, port, nmi_backend, nmi_channel, nmi_invert, debug = False, exclusive = True, byte_interval = 0):
         """
+        port:        Serial port name or an already opened serial port object.
+                     Pass the same port object to share it between several
+                     controllers on the same bus.
         nmi_backend: GPIO Backend instance to control the NMI pin of the PST.
                      This pin is used to stop a module from spinning in case
                      the selected position can not be found.
                      See the supported backends in pyfis.gpio_backends.
         nmi_channel: Channel to use for the NMI signal on the selected GPIO backend
         nmi_invert:  Whether the NMI signal is active-low (False) or active-high (True)
+        byte_interval: Delay in seconds between individual bytes.
+                     By default, messages are written in one go.
+                     Set this (e.g. to 0.05) if the PST boards
+                     can't keep up with the full line rate.
         """
 
         self.nmi_backend = nmi_backend
@@ -44,26 +54,29 @@ class Krone8200PST:
         self.nmi_backend.setup_channel(self.nmi_channel, self.nmi_backend.MODE_OUT)
         self.nmi_backend.set_output(self.nmi_channel, self.nmi_backend.STATE_LOW if self.nmi_invert else self.nmi_backend.STATE_HIGH)
         self.debug = debug
+        self.byte_interval = byte_interval
         if isinstance(port, serial.Serial) or isinstance(port, BaseSerialPort):
             self.port = port
         else:
-            self.port = serial.Serial(port, baudrate=2400, stopbits=2, timeout=1.0, exclusive=exclusive)
+            self.port = serial.Serial(port, baudrate=2400, stopbits=2, timeout=1.0, write_timeout=1.0, exclusive=exclusive)
 
     def debug_message(self, message):
         """
         Turn a message into a readable form
         """
-        result = ""
-        for byte in message:
-            result += "{:02X} ".format(byte)
-        return result
+        if not message:
+            return ""
+        return bytes(message).hex(" ").upper() + " "
 
     def send_raw_message(self, message):
         if self.debug:
             print("TX: " + self.debug_message(message))
+        if not self.byte_interval:
+            self.port.write(bytes(message))
+            return
         for byte in message:
-            self.port.write(bytearray([byte]))
-            time.sleep(0.05)
+            self.port.write(bytes((byte,)))
+            time.sleep(self.byte_interval)
 
     def set_home(self):
         """
@@ -75,7 +88,8 @@ class Krone8200PST:
         """
         Set a given unit to a given position
         """
-        return self.send_raw_message([0x3A, address, int_to_bcd(position)])
+        bcd = self._BCD[position] if 0 <= position < 100 else int_to_bcd(position)
+        return self.send_raw_message([0x3A, address, bcd])
 
     def update(self):
         """
@@ -93,15 +107,24 @@ class Krone8200PST:
         """
         Stop all modules from rotating by asserting NMI
         """
-        self.nmi_backend.set_output(self.nmi_channel, self.nmi_backend.STATE_HIGH if self.nmi_invert else self.nmi_backend.STATE_LOW)
-        time.sleep(0.05)
-        self.nmi_backend.set_output(self.nmi_channel, self.nmi_backend.STATE_LOW if self.nmi_invert else self.nmi_backend.STATE_HIGH)
+        active = self.nmi_backend.STATE_HIGH if self.nmi_invert else self.nmi_backend.STATE_LOW
+        if hasattr(self.nmi_backend, "pulse"):
+            self.nmi_backend.pulse(self.nmi_channel, active, 0.05)
+        else:
+            self.nmi_backend.set_output(self.nmi_channel, active)
+            time.sleep(0.05)
+            self.nmi_backend.set_output(self.nmi_channel, self.nmi_backend.STATE_LOW if self.nmi_invert else self.nmi_backend.STATE_HIGH)
         time.sleep(0.05)
 
     def d_set_module_data(self, module_data):
         # Compatibility function for SplitFlapDisplay class
+        # All set_unit commands are sent as one message
+        message = bytearray()
+        bcd = self._BCD
         for addr, pos in module_data:
-            self.set_unit(addr, pos)
+            message.extend((0x3A, addr, bcd[pos] if 0 <= pos < 100 else int_to_bcd(pos)))
+        if message:
+            self.send_raw_message(message)
 
     def d_update(self):
         # Compatibility function for SplitFlapDisplay class
@@ -17,10 +17,11 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import serial
 
-from itertools import groupby
+from itertools import chain, groupby
 
 from .k9000_rs485 import Krone9000RS485Controller
 from .exceptions import CommunicationError
+from .util import FBM_STATUSES
 
 
 class Krone9000FBK(Krone9000RS485Controller):
@@ -53,44 +54,39 @@ class Krone9000FBK(Krone9000RS485Controller):
     CMD_SET_FBM_CODES_SEQ = 0x08 | FLAG_FBM_COMMAND
     CMD_SET_FBM_CODES_ADDR = 0x09 | FLAG_FBM_COMMAND
     
+    # Bits 0...6 of every possible line data byte as a string,
+    # least significant bit first
+    _LINE_DATA_BITS = tuple(format(b & 0x7F, "07b")[::-1] for b in range(256))
+    
     def _get_fbm_status(self, stat):
         # Return human-readable error strings
         # based on FBM error bits
-        if stat & 0x08:
-            lut = {
-                0b1000: "comm_error",
-                0b1001: "start_missing",
-                0b1010: "unknown_char",
-                0b1011: "external_rotation",
-                0b1100: "rotation_timeout",
-                0b1101: "fbm_missing",
-                0b1111: "rotating"
-            }
-            return [lut.get(stat & 0x0f, "")]
-        else:
-            errors = []
-            if stat & 0x04:
-                errors.append("no_ac")
-            if stat & 0x02:
-                errors.append("no_flap_imps")
-            if stat & 0x01:
-                errors.append("no_home_imp")
-            return errors
+        return list(FBM_STATUSES[stat & 0x0f])
     
     def _rle(self, data):
-        # Simple run-length encoding
-        rle_data = []
-        for k,i in groupby(data):
-            run = list(i)
-            if(len(run) > 2):
-                while len(run) > 128:
-                    rle_data.extend([(len(run) - 1) | 0x80, k])
-                    run = run[128:]
-                rle_data.extend([(len(run) - 1) | 0x80, k])
+        # Simple run-length encoding.
+        # Runs of more than 2 identical bytes are encoded as
+        # (run length - 1) | 0x80 followed by the byte,
+        # with a maximum run length of 128.
+        rle_data = bytearray()
+        for k, i in groupby(data):
+            length = sum(1 for _ in i)
+            if length > 2:
+                while length > 128:
+                    rle_data.append(0xFF)
+                    rle_data.append(k)
+                    length -= 128
+                rle_data.append((length - 1) | 0x80)
+                rle_data.append(k)
             else:
-                rle_data.extend(run)
+                rle_data.extend((k,) * length)
         return rle_data
     
+    def _unpack_line_data(self, module_data):
+        # Each byte of line data holds one bit for each of 7 FBMs,
+        # for a maximum of 256 FBMs
+        return "".join(map(self._LINE_DATA_BITS.__getitem__, module_data))[:256]
+    
     def get_status(self):
         # Get the status of the FBK board
         payload = self.send_command(self.CMD_GET_FBK_STATUS, response=True)
@@ -109,32 +105,15 @@ class Krone9000FBK(Krone9000RS485Controller):
     def get_fbm_ids(self):
         # Get a list of all connected FBM IDs
         payload = self.send_command(self.CMD_GET_LINE_INIT_DATA, response=True)
-        module_data = payload[1:]
-        modules_present = []
-        addr = 0
-        for byte in module_data:
-            for bit in range(7):
-                if byte & (1 << bit):
-                    modules_present.append(addr)
-                addr += 1
-                if addr > 255:
-                    break
-        return modules_present
+        bits = self._unpack_line_data(payload[1:])
+        return [addr for addr, bit in enumerate(bits) if bit == "1"]
     
     def get_fbm_statuses(self):
         # True means okay, False means FBM error or not present
         # (see get_fbm_ids to get a list of present FBMs)
         payload = self.send_command(self.CMD_GET_LINE_DATA, response=True)
-        module_data = payload[1:]
-        module_statuses = {}
-        addr = 0
-        for byte in module_data:
-            for bit in range(7):
-                module_statuses[addr] = bool(byte & (1 << bit))
-                addr += 1
-                if addr > 255:
-                    break
-        return module_statuses
+        bits = self._unpack_line_data(payload[1:])
+        return dict(enumerate(bit == "1" for bit in bits))
     
     def set_blinker(self, state):
         # Set the blinker associated with this FBK on or off
@@ -180,9 +159,7 @@ class Krone9000FBK(Krone9000RS485Controller):
         payload = self.send_command(self.CMD_GET_FBM_STATUS, addrs, response=True)
         module_statuses = {}
         data = payload[1:]
-        for i in range(0, len(data), 2):
-            addr = data[i]
-            stat = data[i + 1]
+        for addr, stat in zip(data[0::2], data[1::2]):
             module_statuses[addr] = {
                 'home_pos': bool(stat & 0x40),
                 'reset': bool(stat & 0x20),
@@ -203,13 +180,8 @@ class Krone9000FBK(Krone9000RS485Controller):
         # Get the currently displayed character for up to 10 FBMs.
         # addrs is a list of FBM IDs to be queried
         payload = self.send_command(self.CMD_GET_FBM_CONTENT, addrs, response=True)
-        module_contents = {}
         data = payload[1:]
-        for i in range(0, len(data), 2):
-            addr = data[i]
-            char = data[i + 1]
-            module_contents[addr] = chr(char)
-        return module_contents
+        return dict(zip(data[0::2], map(chr, data[1::2])))
     
     def get_all_fbm_contents(self):
         # Automatically read the list of connected FBM IDs
@@ -248,6 +220,8 @@ class Krone9000FBK(Krone9000RS485Controller):
     def set_fbm_codes_addr(self, codes, immediate = False):
         # Set FBM character codes to be displayed
         # with explicit addressing
+        # codes is a flat sequence of address and code bytes
+        # (list, bytes or bytearray)
         cmd = self.CMD_SET_FBM_CODES_ADDR
         if immediate:
             cmd |= self.FLAG_START_IMMEDIATELY
@@ -255,8 +229,11 @@ class Krone9000FBK(Krone9000RS485Controller):
     
     def d_set_module_data(self, module_data):
         # Compatibility function for SplitFlapDisplay class
-        for chunk in self._chunks(module_data, 50):
-            self.set_fbm_codes_addr([i for s in chunk for i in s])
+        # Send as many (address, code) pairs per command
+        # as fit into a single block after the command byte
+        pairs_per_block = (self.MAX_CHUNK_SIZE - 1) // 2
+        for chunk in self._chunks(module_data, pairs_per_block):
+            self.set_fbm_codes_addr(bytes(chain.from_iterable(chunk)))
     
     def d_update(self):
         # Compatibility function for SplitFlapDisplay class
@@ -18,8 +18,9 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import serial
 import time
 
+from .util import FBM_STATUSES
 from ..utils.base_serial import BaseSerialPort
-from ..utils.utils import _debug_print, debug_hex
+from ..utils.utils import debug_hex
 
 
 class Krone9000FBM:
@@ -46,38 +47,24 @@ class Krone9000FBM:
     def _get_fbm_status(self, stat):
         # Return human-readable error strings
         # based on FBM error bits
-        if stat & 0x08:
-            lut = {
-                0b1000: "comm_error",
-                0b1001: "start_missing",
-                0b1010: "unknown_char",
-                0b1011: "external_rotation",
-                0b1100: "rotation_timeout",
-                0b1101: "fbm_missing",
-                0b1111: "rotating"
-            }
-            return [lut.get(stat & 0x0f, "")]
-        else:
-            errors = []
-            if stat & 0x04:
-                errors.append("no_ac")
-            if stat & 0x02:
-                errors.append("no_flap_imps")
-            if stat & 0x01:
-                errors.append("no_home_imp")
-            return errors
+        return list(FBM_STATUSES[stat & 0x0f])
 
     def __init__(self, port, debug = False, exclusive = True, encoding_errors = "strict"):
+        """
+        port: Serial port name or an already opened serial port object.
+              Pass the same port object to share it between several
+              controllers on the same bus.
+        """
         self.debug = debug
         self.encoding_errors = encoding_errors
         if isinstance(port, serial.Serial) or isinstance(port, BaseSerialPort):
             self.port = port
         else:
-            self.port = serial.Serial(port, baudrate=4800, parity=serial.PARITY_EVEN, timeout=2.0, exclusive=exclusive)
+            self.port = serial.Serial(port, baudrate=4800, parity=serial.PARITY_EVEN, timeout=2.0, write_timeout=2.0, exclusive=exclusive)
     
-    def send_command(self, command, address = None, code = None, position = None, num_response_bytes = 0):
+    def _build_command(self, command, address = None, code = None, position = None):
         # Build base command byte
-        cmd_bytes = []
+        cmd_bytes = bytearray()
         cmd_base = 0b10010000
 
         # Address expansion bit
@@ -99,16 +86,21 @@ class Krone9000FBM:
             cmd_bytes.append(code & 0b01111111)
         if position is not None:
             cmd_bytes.append(position & 0b01111111)
-        
-        _debug_print(self.debug, "TX:", debug_hex(cmd_bytes))
+        return cmd_bytes
+    
+    def send_command(self, command, address = None, code = None, position = None, num_response_bytes = 0):
+        cmd_bytes = self._build_command(command, address, code, position)
+        if self.debug:
+            print("TX:", debug_hex(cmd_bytes))
         
         # Send it
-        self.port.write(bytearray(cmd_bytes))
+        self.port.write(cmd_bytes)
 
         # Read response
         if num_response_bytes > 0:
             response = self.port.read(num_response_bytes)
-            _debug_print(self.debug, "RX:", debug_hex(response))
+            if self.debug:
+                print("RX:", debug_hex(response))
             return response
         else:
             return None
@@ -155,20 +147,42 @@ class Krone9000FBM:
     def delete_table(self, address):
         return self.send_command(self.CMD_DELETE_TABLE, address, num_response_bytes=1)
     
+    def set_codes(self, module_data):
+        # Set several FBMs at once.
+        # module_data is an iterable of (address, code) pairs.
+        # All commands are sent with a single write.
+        # Command byte for all combinations of the address (bit 1)
+        # and code (bit 0) expansion flags
+        cmd_base = 0b10010000 | self.CMD_SET_CODE
+        commands = (cmd_base, cmd_base | 0b00100000, cmd_base | 0b01000000, cmd_base | 0b01100000)
+        cmd_bytes = bytearray()
+        extend = cmd_bytes.extend
+        for address, code in module_data:
+            extend((commands[(address > 127) << 1 | (code > 127)], address & 0x7F, code & 0x7F))
+        if not cmd_bytes:
+            return
+        if self.debug:
+            print("TX:", debug_hex(cmd_bytes))
+        self.port.write(cmd_bytes)
+    
     def set_text(self, text, start_address, length = None, descending = False):
         if length is not None:
             text = text[:length].ljust(length)
-        for i, char in enumerate(text):
-            address = start_address - i if descending else start_address + i
-            self.set_code(address, ord(char.encode('iso-8859-1', errors=self.encoding_errors)))
+        # Build the commands for all characters and send them in one go
+        # instead of issuing a separate write for every character
+        codes = text.encode('iso-8859-1', errors=self.encoding_errors)
+        if descending:
+            addresses = range(start_address, start_address - len(codes), -1)
+        else:
+            addresses = range(start_address, start_address + len(codes))
+        self.set_codes(zip(addresses, codes))
     
     def get_status(self, addr):
         return self._get_fbm_status(self.read_status(addr)[0])
     
     def d_set_module_data(self, module_data):
         # Compatibility function for SplitFlapDisplay class
-        for addr, code in module_data:
-            self.set_code(addr, code)
+        self.set_codes(module_data)
     
     def d_update(self):
         # Compatibility function for SplitFlapDisplay class
@@ -43,14 +43,8 @@ class Krone9000HLST(Krone9000RS485Controller):
         force_fan: 1=force on, 0=automatic
         low_min_temp: 1=-20°C temperature limit, 0=0°C temperature limit
         """
-        parameter_byte = 0x00
-        parameter_byte |= int(light) << 7
-        parameter_byte |= int(heater) << 6
-        parameter_byte |= int(fan) << 5
-        parameter_byte |= int(force_heater) << 2
-        parameter_byte |= int(force_fan) << 1
-        parameter_byte |= int(low_min_temp)
-        return parameter_byte
+        return ((light & 1) << 7) | ((heater & 1) << 6) | ((fan & 1) << 5) \
+            | ((force_heater & 1) << 2) | ((force_fan & 1) << 1) | (low_min_temp & 1)
     
     def get_status(self):
         # Get the status of the FBK board
@@ -16,8 +16,12 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import serial
+import struct
 import time
 
+from functools import reduce
+from operator import xor
+
 from .exceptions import CommunicationError, NACKError, BusyError
 from ..utils.base_serial import BaseSerialPort
 
@@ -38,17 +42,26 @@ class Krone9000RS485Controller:
     STATUS_BUSY = 0x10
     STATUS_NACK = 0x15
     
+    # Start sequence, board ID, address, length, control byte, chunk ID
+    FRAME_HEADER = struct.Struct(">HBBBBB")
+    
     MAX_CHUNK_SIZE = 128
     RETRY_COUNT = 10
     RETRY_INTERVAL = 0.2
 
     def __init__(self, port, address, timeout = 1.0, debug = False, exclusive = True):
+        """
+        port: Serial port name or an already opened serial port object.
+              Pass the same port object to share it between the controllers
+              of several boards on the same bus.
+        timeout: Read and write timeout in seconds if a port name is given
+        """
         self.address = address
         self.debug = debug
         if isinstance(port, serial.Serial) or isinstance(port, BaseSerialPort):
             self.port = port
         else:
-            self.port = serial.Serial(port, baudrate=19200, timeout=timeout, exclusive=exclusive)
+            self.port = serial.Serial(port, baudrate=19200, timeout=timeout, write_timeout=timeout, exclusive=exclusive)
     
     @staticmethod
     def _chunks(lst, n):
@@ -58,27 +71,19 @@ class Krone9000RS485Controller:
     
     def debug_print(self, data, receive = False):
         if self.debug:
-            print(f"{self.BOARD_NAME:<4} {self.address} {'RX' if receive else 'TX'}: " + " ".join((format(x, "02X") for x in data)))
+            print(f"{self.BOARD_NAME:<4} {self.address} {'RX' if receive else 'TX'}: " + bytes(data).hex(" ").upper())
     
     def make_checksum(self, payload):
-        checksum = 0x00
-        for byte in payload:
-            checksum ^= byte
-        return checksum
+        return reduce(xor, payload, 0x00)
     
     def check_checksum(self, data):
         checksum = self.make_checksum(data[2:-1])
         return checksum == data[-1]
             
     def send_command(self, command, parameters = None, response = False, ack = True, block = False):
-        def _chunks(lst, n):
-            # Yield successive n-sized chunks from lst.
-            for i in range(0, len(lst), n):
-                yield lst[i:i + n]
-        
-        data = [command]
+        data = bytearray((command,))
         if parameters is not None:
-            if type(parameters) in (list, tuple):
+            if type(parameters) in (list, tuple, bytes, bytearray):
                 data.extend(parameters)
             else:
                 data.append(parameters)
@@ -97,19 +102,26 @@ class Krone9000RS485Controller:
         if ack:
             control |= self.FLAG_ACK
         
-        for chunk_id, chunk in enumerate(_chunks(data, self.MAX_CHUNK_SIZE)):
+        # Chunks are views into the data, not copies
+        data_view = memoryview(data)
+        for chunk_id, start in enumerate(range(0, len(data), self.MAX_CHUNK_SIZE)):
+            chunk = data_view[start:start + self.MAX_CHUNK_SIZE]
+            # Frame: header, chunk data, end byte and checksum.
+            # Length counts everything from the board ID to the end byte
+            header_size = self.FRAME_HEADER.size
+            cmd_bytes = bytearray(header_size + len(chunk) + 2)
+            self.FRAME_HEADER.pack_into(cmd_bytes, 0, 0xFFFF, self.BOARD_ID, self.address, 6 + len(chunk), control, chunk_id + 1)
+            cmd_bytes[header_size:-2] = chunk
+            cmd_bytes[-1] = self.make_checksum(memoryview(cmd_bytes)[2:-1])
+            
             for retry in range(self.RETRY_COUNT):
-                payload = [self.BOARD_ID, self.address, 0x00, control, chunk_id + 1] + chunk + [0x00]
-                length = len(payload)
-                payload[2] = length
-                checksum = self.make_checksum(payload)
-                cmd_bytes = [0xFF, 0xFF] + payload + [checksum]
-                
                 # Debug output if enabled
                 self.debug_print(cmd_bytes)
                 
-                # Send it
-                self.port.write(bytearray(cmd_bytes))
+                # Send it and wait until it has been transmitted
+                # so the response is read right after the bus turns around
+                self.port.write(cmd_bytes)
+                self.port.flush()
                 
                 # Check status
                 if not response:
@@ -133,8 +145,11 @@ class Krone9000RS485Controller:
             return None
     
     def check_status(self):
-        status = bytearray(self.port.read(1))[0]
-        self.debug_print([status], receive=True)
+        status = self.port.read(1)
+        if not status:
+            raise CommunicationError("No status received")
+        self.debug_print(status, receive=True)
+        status = status[0]
         if status == self.STATUS_ACK:
             return True
         elif status == self.STATUS_BUSY:
@@ -145,9 +160,9 @@ class Krone9000RS485Controller:
             raise CommunicationError(f"Unknown status byte {status:02X}")
     
     def read_response(self):
-        data = bytearray()
-        header = bytearray(self.port.read(4))
-        if len(header) != 4:
+        # Start sequence, board ID, address and length
+        header = bytearray(self.port.read(5))
+        if len(header) != 5:
             if len(header) == 1:
                 if header[0] == self.STATUS_BUSY:
                     raise BusyError()
@@ -161,22 +176,18 @@ class Krone9000RS485Controller:
             raise CommunicationError(f"Invalid board ID {header[2]:02X}")
         if header[3] != self.address:
             raise CommunicationError(f"Invalid address {header[3]:02X}")
-        data.extend(header)
-        
-        length = bytearray(self.port.read(1))[0]
-        payload = bytearray(self.port.read(length - 3))
-        checksum = bytearray(self.port.read(1))[0]
         
-        data.append(length)
-        data.extend(payload)
-        data.append(checksum)
+        # Payload (length - 3 bytes) and checksum
+        length = header[4]
+        data = header + self.port.read(length - 2)
         
         self.debug_print(data, receive=True)
         if not self.check_checksum(data):
             raise CommunicationError("Checksum mismatch")
-        return payload[2:-1]
+        # Strip control byte, chunk ID, end byte and checksum
+        return data[7:-2]
     
     def send_heartbeat(self):
-        cmd_bytes = [0xFF, 0xFF, self.BOARD_ID, self.address, 0x00]
+        cmd_bytes = bytes((0xFF, 0xFF, self.BOARD_ID, self.address, 0x00))
         self.debug_print(cmd_bytes)
-        self.port.write(bytearray(cmd_bytes))
+        self.port.write(cmd_bytes)
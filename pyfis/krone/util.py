@@ -19,6 +19,45 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import time
 
 
+# Human-readable error strings for all FBM status codes.
+# Codes 0...7 are a combination of error bits,
+# codes 8...15 are distinct errors
+FBM_STATUSES = (
+    (),
+    ("no_home_imp",),
+    ("no_flap_imps",),
+    ("no_flap_imps", "no_home_imp"),
+    ("no_ac",),
+    ("no_ac", "no_home_imp"),
+    ("no_ac", "no_flap_imps"),
+    ("no_ac", "no_flap_imps", "no_home_imp"),
+    ("comm_error",),
+    ("start_missing",),
+    ("unknown_char",),
+    ("external_rotation",),
+    ("rotation_timeout",),
+    ("fbm_missing",),
+    ("",),
+    ("rotating",)
+)
+
+
+def _wait_for_standstill(fbm, addr, timeout):
+    """
+    Wait until the unit has stopped rotating,
+    but no longer than the given timeout in seconds
+    """
+    deadline = time.monotonic() + timeout
+    # Give the unit some time to start rotating
+    time.sleep(0.5)
+    while time.monotonic() < deadline:
+        status = fbm.read_status(addr)
+        # Status code 0b1111 means the unit is rotating
+        if status and status[0] & 0x0f != 0x0f:
+            return
+        time.sleep(0.2)
+
+
 def calibrate_fbm_interactive(fbm, addr):
     """
     Interactive process for calibrating the flap count
@@ -30,7 +69,7 @@ def calibrate_fbm_interactive(fbm, addr):
     input("Press Enter to start.")
     fbm.set_home()
     print("\nWait for the unit to stop rotating!")
-    time.sleep(3)
+    _wait_for_standstill(fbm, addr, 3)
     res = ""
     while res not in ("Y", "N"):
         res = input("Was the home position reached? [Y/N]: ").upper()
@@ -44,7 +83,7 @@ def calibrate_fbm_interactive(fbm, addr):
     input("Press Enter to start.")
     fbm.start_calibration_br1()
     print("\nWait for the unit to stop rotating!")
-    time.sleep(5)
+    _wait_for_standstill(fbm, addr, 5)
     
     success = False
     back_to_step_2 = False
@@ -75,7 +114,7 @@ def calibrate_fbm_interactive(fbm, addr):
         input("Press Enter to start.")
         fbm.set_home()
         print("\nWait for the unit to stop rotating!")
-        time.sleep(3)
+        _wait_for_standstill(fbm, addr, 3)
         res = ""
         while res not in ("Y", "N"):
             res = input("Was the home position reached? [Y/N]: ").upper()
@@ -96,13 +135,13 @@ def calibrate_fbm_interactive(fbm, addr):
             print("Test the calibration by entering letters")
             print("and seeing if the unit hits them correctly.")
             char = ""
-            while len(char) != 1 or ord(char) not in range(128):
+            while len(char) != 1 or not char.isascii():
                 char = input("Enter a character to test or nothing to finish: ").upper()
                 if char == "":
                     exit_step_4 = True
                     success = True
                     break
-                if len(char) > 1 or ord(char) not in range(128):
+                if len(char) > 1 or not char.isascii():
                     continue
                 else:
                     fbm.set_code(addr, ord(char))
@@ -17,7 +17,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
 import crccheck
-import math
+import struct
 
 from PIL import Image, ImageDraw, ImageFont
 from pprint import pprint
@@ -28,6 +28,9 @@ class LawoFont:
     LAWO font files, typically named FONTNAME.FXX, where XX is the glyph height
     """
     
+    # Glyph table label fonts by size, see _get_label_font
+    _label_fonts = {}
+    
     def __init__(self):
         self.name = None
         self.change_signature = None
@@ -42,30 +45,37 @@ class LawoFont:
         self.num_blocks = None
         self.glyph_metadata = None
         self.glyph_data = None
+        self.glyph_widths = None
         self.num_glyphs = None
         self.widest_glyph = None
         self.narrowest_glyph = None
         self.charset = None
+        self._glyph_cache = {}
+    
+    @classmethod
+    def _get_label_font(cls, size):
+        # Font for the glyph table labels, loaded only once per size.
+        # Falls back to PIL's default font if Arial is not available.
+        if size not in cls._label_fonts:
+            try:
+                cls._label_fonts[size] = ImageFont.truetype("arial.ttf", size)
+            except OSError:
+                cls._label_fonts[size] = ImageFont.load_default()
+        return cls._label_fonts[size]
     
     @staticmethod
     def _read_c_str(data):
-        result = ""
-        for byte in data:
-            if byte == 0x00:
-                return result
-            else:
-                result += bytes([byte]).decode('cp1252')
-        return result
+        end = data.find(b"\x00")
+        if end >= 0:
+            data = data[:end]
+        return data.decode('cp1252', errors='replace')
     
     @staticmethod
     def _read_until_double_null(data):
-        result = ""
-        for i, byte in enumerate(data):
-            if byte == 0x00 and i < len(data) - 1 and data[i+1] == 0x00:
-                return result
-            else:
-                result += bytes([byte]).decode('cp1252')
-        return result
+        end = data.find(b"\x00\x00")
+        if end >= 0:
+            data = data[:end]
+        return data.decode('cp1252', errors='replace')
     
     @staticmethod
     def _chunks(lst, n):
@@ -78,7 +88,7 @@ class LawoFont:
         
         self.name = self._read_c_str(data[6:14]).strip()
         self.change_signature = data[16] << 8 | data[7] # Changes with every file change
-        self.file_size = data[20] << 8 | data[21]
+        self.file_size, = struct.unpack_from(">H", data, 20)
         self.file_name = self._read_c_str(data[32:45])
         self.glyph_h = data[45]
         self.baseline = data[46]
@@ -86,9 +96,10 @@ class LawoFont:
         self.max_char = data[48]
         self.char_spacing = data[52]
         self.preview_text = self._read_c_str(data[56:60])
-        self.num_blocks = data[60] << 8 | data[61] # A block is a column of bytes with a length equal to the glyph height
+        self.num_blocks, = struct.unpack_from(">H", data, 60) # A block is a column of bytes with a length equal to the glyph height
         self.glyph_metadata = dict(zip(range(self.min_char, self.max_char+1), [None]*(self.max_char-self.min_char+1)))
         self.glyph_data = dict(zip(range(self.min_char, self.max_char+1), [None]*(self.max_char-self.min_char+1)))
+        self._glyph_cache = {}
         
         extra_data_start = 70 + 3 * (self.max_char - self.min_char + 1)
         if data[extra_data_start] == 0x00:
@@ -104,30 +115,35 @@ class LawoFont:
         self.widest_glyph = 0
         self.narrowest_glyph = 255
         self.charset = ""
-        for c in range(self.min_char, self.max_char+1):
-            i = 70 + 3 * (c - self.min_char)
+        # Widths of all 256 possible glyphs (0 for missing glyphs)
+        self.glyph_widths = bytearray(256)
+        # Glyph metadata: 3 bytes per character, width and big-endian offset
+        glyph_entries = struct.iter_unpack(">BH", data[70:extra_data_start])
+        for c, (width, offset) in zip(range(self.min_char, self.max_char+1), glyph_entries):
             self.glyph_metadata[c] = {
-                'glyph_w': data[i],
-                'offset': data[i+1] << 8 | data[i+2] # Offset from start of glyph data block in bits
+                'glyph_w': width,
+                'offset': offset # Offset from start of glyph data block in bits
             }
-            if data[i] > 0:
+            self.glyph_widths[c] = width
+            if width > 0:
                 self.num_glyphs += 1
-                self.charset += bytes([c]).decode('cp1252')
-                if data[i] > self.widest_glyph:
-                    self.widest_glyph = data[i]
-                if data[i] < self.narrowest_glyph:
-                    self.narrowest_glyph = data[i]
+                self.charset += bytes([c]).decode('cp1252', errors='replace')
+                if width > self.widest_glyph:
+                    self.widest_glyph = width
+                if width < self.narrowest_glyph:
+                    self.narrowest_glyph = width
         
         for c in range(self.min_char, self.max_char+1):
             width = self.glyph_metadata[c]['glyph_w']
             glyph_start = glyph_data_block_start + self.glyph_metadata[c]['offset'] // 8
-            i = glyph_start
-            glyph_data = []
+            # Each row of the glyph is a slice of consecutive bytes,
+            # rows are num_blocks bytes apart
+            row_bytes = (width + 7) >> 3
+            rows = []
             for y in range(self.glyph_h):
-                for x_byte in range(math.ceil(width / 8)):
-                    glyph_data.append(data[i + x_byte])
-                i += self.num_blocks
-            self.glyph_data[c] = glyph_data
+                i = glyph_start + y * self.num_blocks
+                rows.append(data[i:i + row_bytes])
+            self.glyph_data[c] = b"".join(rows)
     
     def print_info(self):
         print("\n".join([f"Name:              {self.name}",
@@ -139,41 +155,39 @@ class LawoFont:
                          f"Glyph Spacing:     {self.char_spacing} px",
                          f"Widest Glyph:      {self.widest_glyph} px",
                          f"Narrowest Glyph:   {self.narrowest_glyph} px",
-                         f"Lowest Character:  {self.min_char} ({bytes([self.min_char]).decode('cp1252')})",
-                         f"Highest Character: {self.max_char} ({bytes([self.max_char]).decode('cp1252')})",
+                         f"Lowest Character:  {self.min_char} ({bytes([self.min_char]).decode('cp1252', errors='replace')})",
+                         f"Highest Character: {self.max_char} ({bytes([self.max_char]).decode('cp1252', errors='replace')})",
                          f"Preview Text:      {self.preview_text}",
                          f"# Glyphs:          {self.num_glyphs}",
                          f"# Data Blocks:     {self.num_blocks}",
                          f"Character Set:     {self.charset}"]))
     
     def get_glyph_width(self, code):
-        if code not in self.glyph_metadata:
+        if not 0 <= code <= 255:
             return 0
-        return self.glyph_metadata[code]['glyph_w']
+        return self.glyph_widths[code]
     
-    def render_glyph(self, code):
-        if code not in self.glyph_metadata:
-            return None
-        glyph_metadata = self.glyph_metadata[code]
-        glyph_data = self.glyph_data[code]
-        width = glyph_metadata['glyph_w']
-        height = self.glyph_h
+    def _get_glyph_image(self, code):
+        # Rendered glyphs are cached, so the returned image
+        # must not be modified. Only used internally for pasting.
+        if code in self._glyph_cache:
+            return self._glyph_cache[code]
+        width = self.get_glyph_width(code)
         if width == 0:
             return None
-        img = Image.new('L', (width, height), 0)
-        px = img.load()
-        i = 0
-        for y in range(height):
-            for x_byte in range(math.ceil(width / 8)):
-                byte = glyph_data[i]
-                for x_bit in range(8):
-                    x = x_byte * 8 + 7 - x_bit
-                    if x >= width:
-                        continue
-                    px[x,y] = 255 if (byte & (1 << x_bit)) else 0
-                i += 1
+        # The glyph data is already laid out like a 1 bit image:
+        # Rows padded to full bytes, leftmost pixel in the MSB
+        img = Image.frombytes('1', (width, self.glyph_h), bytes(self.glyph_data[code]))
+        img = img.convert('L')
+        self._glyph_cache[code] = img
         return img
     
+    def render_glyph(self, code):
+        img = self._get_glyph_image(code)
+        if img is None:
+            return None
+        return img.copy()
+    
     def render_glyph_table(self, x_spacing=5, x_offset=25, y_spacing=5, row_min_height=12, num_cols=16):
         num_chars = self.max_char - self.min_char + 1
         
@@ -188,14 +202,10 @@ class LawoFont:
         
         # Calculate widths of each column based on maximum glyph width in that column
         # taking into account spacings
+        table_widths = self.glyph_widths[table_range_min:table_range_max + 1]
         col_widths = {}
-        for row, char_code_base in enumerate(row_list):
-            for col in range(num_cols):
-                char_code = char_code_base + col
-                if char_code < 0 or char_code > 255:
-                    continue
-                if col not in col_widths or self.glyph_metadata.get(char_code, {'glyph_w': 0})['glyph_w'] + x_spacing + x_offset > col_widths[col]:
-                    col_widths[col] = self.glyph_metadata[char_code]['glyph_w'] + x_spacing + x_offset
+        for col in range(num_cols):
+            col_widths[col] = max(table_widths[col::num_cols], default=0) + x_spacing + x_offset
         
         # Calculate X start positions of each column
         x_tmp = 0
@@ -211,7 +221,7 @@ class LawoFont:
         # Create image
         table = Image.new('L', (width, height), 0)
         draw = ImageDraw.Draw(table)
-        font = ImageFont.truetype("arial.ttf", row_min_height)
+        font = self._get_label_font(row_min_height)
         
         # Render grid, skipping the first row / column
         for row, char_code_base in list(enumerate(row_list))[1:]:
@@ -222,16 +232,18 @@ class LawoFont:
             x = col_offsets[col]
             draw.line((x, 0, x, height - 1), 255, 1)
         
-        # Render glyphs
+        # Render glyphs, centered in the spacing around them
+        glyph_x_offset = x_offset + ((x_spacing + 1) >> 1)
+        glyph_y_offset = (y_spacing + 1) >> 1
         for row, char_code_base in enumerate(row_list):
             for col in range(num_cols):
                 char_code = char_code_base + col
                 x_base = col_offsets[col]
                 y_base = row * row_height
                 draw.text((x_base + 3, y_base), str(char_code), 255, font)
-                glyph = self.render_glyph(char_code)
+                glyph = self._get_glyph_image(char_code)
                 if glyph:
-                    table.paste(glyph, (x_base + x_offset + math.ceil(x_spacing / 2), y_base + math.ceil(y_spacing / 2)))
+                    table.paste(glyph, (x_base + glyph_x_offset, y_base + glyph_y_offset))
         
         return table
     
@@ -245,7 +257,7 @@ class LawoFont:
         img = Image.new('L', (width, self.glyph_h), 0)
         x = 0
         for code in chars:
-            glyph = self.render_glyph(code)
+            glyph = self._get_glyph_image(code)
             img.paste(glyph, (x, 0))
             x += self.get_glyph_width(code) + self.char_spacing
         return img
@@ -18,6 +18,9 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import math
 import time
 
+from functools import reduce
+from operator import xor
+
 try:
     from PIL import Image
 except ImportError:
@@ -25,6 +28,13 @@ except ImportError:
 else:
     _HAS_PIL = True
 
+# MONO flipdot column byte for every group of 4 pixels given as a nibble
+# (topmost pixel in bit 3): All pixels flipped, pixel colors in bits 0, 2, 4, 6
+_FLIPDOT_NIBBLES = bytes(0b10101010 | (n & 1) << 6 | (n & 2) << 3 | (n & 4) | (n & 8) >> 3 for n in range(16))
+
+# Both column bytes for every byte of 8 pixels (topmost pixel in bit 7)
+_FLIPDOT_BYTES = tuple(bytes((_FLIPDOT_NIBBLES[b >> 4], _FLIPDOT_NIBBLES[b & 0x0F])) for b in range(256))
+
 class MONOProtocol:
     """
     All the logic related to the MONO protocol
@@ -38,6 +48,14 @@ class MONOProtocol:
     CMD_BITMAP_DATA_LED = 0xD0
     CMD_DISPLAY_BITMAP_LED = 0xE0
     
+    # Constant command payloads
+    PAYLOAD_PRE_BITMAP_FLIPDOT = bytes((0x00, 0x10, 0x00, 0x50, 0x00, 0x02, 0x2E))
+    PAYLOAD_PRE_BITMAP_LED_1 = bytes((0x00, 0xff, 0x2f, 0x10, 0x20, 0x40, 0x60, 0x90, 0xc0, 0xf0, 0x03, 0x13, 0x33, 0x53, 0x83, 0xb3, 0xe3, 0x89))
+    PAYLOAD_DISPLAY_BITMAP_LED = bytes((0x1a,))
+    
+    # Minimum interval between the start of two flipdot column frames
+    FLIPDOT_COLUMN_INTERVAL = 0.02
+    
     def __init__(self, debug = False):
         """
         debug:
@@ -82,7 +100,7 @@ class MONOProtocol:
         
         if self.debug:
             action = "Received" if receive else "Sending"
-            frame_debug = " ".join("{:02X}".format(byte) for byte in frame)
+            frame_debug = bytes(frame).hex(" ").upper()
             print("{} frame:".format(action))
             print(frame_debug)
     
@@ -94,10 +112,7 @@ class MONOProtocol:
         The payload to calculate the checksum for
         """
         
-        chk = 0xED
-        for b in payload:
-            chk ^= b
-        return chk
+        return reduce(xor, payload, 0xED)
     
     def checksum_flipdot(self, payload):
         """
@@ -107,10 +122,7 @@ class MONOProtocol:
         The payload to calculate the checksum for
         """
         
-        chk = 0xFF
-        for b in payload:
-            chk ^= b
-        return chk
+        return reduce(xor, payload, 0xFF)
     
     def escape_frame(self, frame):
         """
@@ -120,15 +132,9 @@ class MONOProtocol:
         The frame to escape.
         """
         
-        escaped_frame = []
-        for b in frame:
-            if b == 0x7e:
-                escaped_frame += [0x7d, 0x5e]
-            elif b == 0x7d:
-                escaped_frame += [0x7d, 0x5d]
-            else:
-                escaped_frame.append(b)
-        return escaped_frame
+        # The escape byte needs to be escaped first so the escape bytes
+        # inserted for the start/stop byte are not escaped again
+        return bytes(frame).replace(b"\x7d", b"\x7d\x5d").replace(b"\x7e", b"\x7d\x5e")
     
     def prepare_frame(self, frame):
         """
@@ -140,12 +146,10 @@ class MONOProtocol:
         The frame (as a bytearray) to prepare
         
         Returns:
-        The prepared frame (as a bytearray)
+        The prepared frame (as bytes)
         """
         
-        prepared_frame = self.escape_frame(frame)
-        prepared_frame = [0x7e] + prepared_frame + [0x7e]
-        return prepared_frame
+        return b"\x7e" + self.escape_frame(frame) + b"\x7e"
     
     def send_frame(self, frame, reply_length = 0):
         """
@@ -203,9 +207,8 @@ class MONOProtocol:
         How many bytes to expect as a reply
         """
         
-        frame = []
-        frame.append(self.get_command_byte(command, address))
-        frame += payload
+        frame = bytearray((self.get_command_byte(command, address),))
+        frame.extend(payload)
         return self.send_frame(frame, reply_length=reply_length)
     
     def send_bitmap_data_led(self, address, bitmap_data):
@@ -223,7 +226,8 @@ class MONOProtocol:
         - Left to right
         """
         
-        payload = [0xFF, len(bitmap_data)] + bitmap_data
+        payload = bytearray((0xFF, len(bitmap_data)))
+        payload += bytes(bitmap_data)
         payload.append(self.checksum_led(bitmap_data))
         return self.send_command(address, self.CMD_BITMAP_DATA_LED, payload)
     
@@ -244,20 +248,20 @@ class MONOProtocol:
         
         if type(image) is str:
             image = Image.open(image)
-        elif type(image) is not Image:
+        elif not isinstance(image, Image.Image):
             raise ValueError("image needs to be either a file path or a PIL Image instance")
         
-        pixels = image.load()
+        # Turn the image into a 1 bit image, padded with black pixels
+        # at the bottom to a multiple of 8 pixels in height
         width, height = image.size
-        max_col_end = math.ceil(height / 8) * 8
-        img_data = []
-        for x in range(width):
-            for col_start in range(max_col_end-8, -1, -8):
-                col_byte = 0x00
-                for y in range(col_start, col_start+8):
-                    col_byte |= (pixels[x, y] > 0) << (y%8)
-                img_data.append(col_byte)
-        return self.send_bitmap_data_led(address, img_data)
+        bitmap = Image.new('1', (width, math.ceil(height / 8) * 8), 0)
+        bitmap.paste(image.convert('L').point(lambda value: 255 if value else 0, '1'), (0, 0))
+        # Flipped upside down and transposed, each row of the bitmap
+        # is one column of the image from bottom to top, and PIL's
+        # MSB-first packing puts the topmost pixel of every 8 pixel block
+        # into the LSB, which is exactly the MONO LED format
+        bitmap = bitmap.transpose(Image.FLIP_TOP_BOTTOM).transpose(Image.TRANSPOSE)
+        return self.send_bitmap_data_led(address, bitmap.tobytes())
     
     def display_image_led(self, address, image):
         """
@@ -283,13 +287,13 @@ class MONOProtocol:
         width_blocks = math.ceil(width/4)
         height_blocks = math.ceil(height/4)
         
-        self.send_command(address, self.CMD_PRE_BITMAP_LED_1, [0x00, 0xff, 0x2f, 0x10, 0x20, 0x40, 0x60, 0x90, 0xc0, 0xf0, 0x03, 0x13, 0x33, 0x53, 0x83, 0xb3, 0xe3, 0x89])
+        self.send_command(address, self.CMD_PRE_BITMAP_LED_1, self.PAYLOAD_PRE_BITMAP_LED_1)
         time.sleep(0.05)
-        self.send_command(address, self.CMD_PRE_BITMAP_LED_2, [0x01, 0x00, 0x00, 0x00, 0x00, 0x00, num_img_bytes, width_blocks, height_blocks])
+        self.send_command(address, self.CMD_PRE_BITMAP_LED_2, (0x01, 0x00, 0x00, 0x00, 0x00, 0x00, num_img_bytes, width_blocks, height_blocks))
         time.sleep(0.05)
         self.send_image_led(address, image)
         time.sleep(0.05)
-        self.send_command(address, self.CMD_DISPLAY_BITMAP_LED, [0x1a])
+        self.send_command(address, self.CMD_DISPLAY_BITMAP_LED, self.PAYLOAD_DISPLAY_BITMAP_LED)
         time.sleep(0.05)
     
     def send_column_data_flipdot(self, address, col_address, column_data):
@@ -312,8 +316,11 @@ class MONOProtocol:
             - Bits 5 to 0 are the same for the other 3 pixels
         """
         
-        payload = [col_address] + column_data + [0x00]
-        payload.append(self.checksum_flipdot([self.get_command_byte(self.CMD_COLUMN_DATA_FLIPDOT, address)] + payload))
+        payload = bytearray((col_address,))
+        payload += bytes(column_data)
+        payload.append(0x00)
+        # The checksum also covers the command byte
+        payload.append(self.checksum_flipdot(payload) ^ self.get_command_byte(self.CMD_COLUMN_DATA_FLIPDOT, address))
         return self.send_command(address, self.CMD_COLUMN_DATA_FLIPDOT, payload)
     
     def send_image_flipdot(self, address, image, col_offset):
@@ -339,22 +346,30 @@ class MONOProtocol:
         elif not isinstance(image, Image.Image):
             raise ValueError("image needs to be either a file path or a PIL Image instance")
         
-        pixels = image.convert('L').load()
+        # Turn the image into a 1 bit image, padded with black pixels
+        # at the top to a multiple of 4 pixels in height
         width, height = image.size
-        max_col_end = math.ceil(height / 4) * 4
+        col_height = math.ceil(height / 4)
+        bitmap = Image.new('1', (width, col_height * 4), 0)
+        bitmap.paste(image.convert('L').point(lambda value: 255 if value else 0, '1'), (0, col_height * 4 - height))
+        # Transposed, each row of the bitmap is one column of the image
+        bitmap = bitmap.transpose(Image.TRANSPOSE)
+        bitmap_data = bitmap.tobytes()
+        row_bytes = (col_height * 4 + 7) // 8
         col_addr = col_offset
         for x in range(width):
-            col_data = []
-            for col_start in range(max_col_end-4, -1, -4):
-                col_byte = 0b10101010 # Default: all pixels flipped, none skipped
-                for y in range(col_start, col_start+4):
-                    col_byte |= (pixels[x, height-y-1] > 0) << (6-((y%4)*2))
-                col_data.append(col_byte)
+            col_start = time.monotonic()
+            row = bitmap_data[x * row_bytes:(x + 1) * row_bytes]
+            col_data = b"".join(map(_FLIPDOT_BYTES.__getitem__, row))[:col_height]
             self.send_column_data_flipdot(address, col_addr, col_data)
             col_addr += 1
             if x != 0 and (x+1) % 28 == 0:
                 col_addr += 4
-            time.sleep(0.02)
+            # Only wait for what's left of the column interval,
+            # the time spent preparing and sending the frame counts towards it
+            remaining = self.FLIPDOT_COLUMN_INTERVAL - (time.monotonic() - col_start)
+            if remaining > 0:
+                time.sleep(remaining)
     
     def display_image_flipdot(self, address, image, col_offset):
         """
@@ -373,6 +388,6 @@ class MONOProtocol:
         The column address offset, i.e. the address of the leftmost column
         """
         
-        self.send_command(address, self.CMD_PRE_BITMAP_FLIPDOT, [0x00, 0x10, 0x00, 0x50, 0x00, 0x02, 0x2E])
+        self.send_command(address, self.CMD_PRE_BITMAP_FLIPDOT, self.PAYLOAD_PRE_BITMAP_FLIPDOT)
         time.sleep(0.05)
         self.send_image_flipdot(address, image, col_offset)
@@ -62,6 +62,27 @@ class SerialMONOMaster(MONOProtocol):
         """
         
         return self.device.read(length)
-
+    
+    def close(self):
+        """
+        Close the serial port.
+        Safe to call more than once or on a partially initialized object.
+        """
+        
+        device = getattr(self, 'device', None)
+        if device is not None and device.is_open:
+            device.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def __del__(self):
-        self.device.close()
+        # Fallback only, use close() or a with block to release the port reliably
+        try:
+            self.close()
+        except Exception:
+            pass
+
@@ -23,10 +23,11 @@ author = "Julian Metzler"
 author_email = "git@mezgr.de"
 requires = ['pyserial', 'crccheck', 'crcmod']
 extras_require = {
-    'full': ['pillow', 'requests', 'RPi.GPIO'],
+    'full': ['pillow', 'requests', 'RPi.GPIO', 'aioserial'],
     'http': ['requests'],
     'graphics': ['pillow'],
-    'raspberrypi': ['RPi.GPIO']
+    'raspberrypi': ['RPi.GPIO'],
+    'async': ['aioserial']
 }
 url = "https://github.com/Mezgrman/pyFIS"
 keywords = "led sign message board effect library wrapper serial text display ibis vdv300 bus next stop train mono lawo splitflap industrial factory"
\ No newline at end of file
@@ -18,6 +18,9 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import socket
 
+from contextlib import contextmanager
+from itertools import groupby
+
 
 class MigraTCP:
     """
@@ -36,6 +39,9 @@ class MigraTCP:
         COLOR_YELLOW: ["yellow", "orange"],
         COLOR_TRANSPARENT: ["transparent", "transparency", "alpha"],
     }
+    # Reverse lookup: color name -> color flag
+    COLOR_FLAGS = {name: flag for flag, names in COLOR_NAMES.items() for name in names}
+    COLOR_FLAGS_ASCII = {name: flag.encode('ascii') for name, flag in COLOR_FLAGS.items()}
     
     DIR_OFF = "0"
     DIR_UP = "1"
@@ -46,7 +52,17 @@ class MigraTCP:
     TRIG_HISTORY = "#"
     TRIGGER_MODES = (TRIG_NORMAL, TRIG_HISTORY)
     
-    def __init__(self, host, port=10001, timeout=2.0, debug=False, errors=self.encoding_errors):
+    MAX_PAYLOAD_LENGTH = 230
+    
+    # Length and checksum are sent as two bytes, 0xF0 | high nibble and 0xF0 | low nibble
+    NIBBLE_HIGH = bytes(0xF0 | (i >> 4) for i in range(256))
+    NIBBLE_LOW = bytes(0xF0 | (i & 0x0F) for i in range(256))
+    
+    # Telegrams are small and sent one at a time, so don't let
+    # Nagle's algorithm hold them back waiting for more data
+    DEFAULT_SOCKET_OPTIONS = ((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),)
+    
+    def __init__(self, host, port=10001, timeout=2.0, debug=False, encoding_errors="strict", socket_options=DEFAULT_SOCKET_OPTIONS):
         """
         host:
           The hostname or IP to connect to
@@ -56,14 +72,22 @@ class MigraTCP:
         
         timeout:
           The socket timeout in seconds
+        
+        socket_options:
+          Iterable of (level, option, value) tuples
+          to be set on the socket before connecting
         """
         
         self.debug = debug
         self.encoding_errors = encoding_errors
         self.command_queue_enabled = False
-        self.command_queue = []
+        self.command_queue = bytearray()
+        # Reusable buffer for assembling telegrams
+        self._tx_buffer = bytearray(5 + self.MAX_PAYLOAD_LENGTH + 4)
         
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        for level, option, value in socket_options:
+            self.socket.setsockopt(level, option, value)
         self.socket.connect((host, port))
         self.socket.settimeout(timeout)
 
@@ -100,10 +124,19 @@ class MigraTCP:
     
     def _send(self, telegram):
         self.debug_telegram(telegram)
-        self.socket.send(telegram)
+        self.socket.sendall(telegram)
     
     def _receive(self, length):
-        data = self.socket.recv(length)
+        # recv may return less than requested, keep reading into
+        # the same buffer until the whole telegram has arrived
+        data = bytearray(length)
+        received = 0
+        with memoryview(data) as view:
+            while received < length:
+                count = self.socket.recv_into(view[received:])
+                if not count:
+                    raise ConnectionError("Connection closed by display")
+                received += count
         self.debug_telegram(data, receive=True)
         return data
     
@@ -124,9 +157,11 @@ class MigraTCP:
           The length of the payload of the expected response
         """
         
+        if not isinstance(payload, (bytes, bytearray)):
+            payload = bytes(payload)
         length = len(payload)
-        if length > 230:
-            raise ValueError("Telegram is too long (max. 230 bytes)")
+        if length > self.MAX_PAYLOAD_LENGTH:
+            raise ValueError(f"Telegram is too long (max. {self.MAX_PAYLOAD_LENGTH} bytes)")
         
         frame_ctrl = 0x80
         if response:
@@ -135,18 +170,22 @@ class MigraTCP:
             frame_ctrl |= 0x02
         dest_addr = 0x81
         src_addr = 0x80
-        telegram = bytearray([0x02, dest_addr, src_addr, frame_ctrl])
+        # Header (4), length (2), payload, checksum (2), trailer (1),
+        # assembled in the reusable transmit buffer
+        telegram = memoryview(self._tx_buffer)[:5 + length + (4 if checksum else 0)]
+        telegram[0:4] = bytes((0x02, dest_addr, src_addr, frame_ctrl))
+        pos = 4
         if checksum:
-            len_h = 0xF0 | ((length & 0xF0) >> 4)
-            len_l = 0xF0 | (length & 0x0F)
-            telegram.extend([len_h, len_l])
-        telegram.extend(payload)
+            telegram[4] = self.NIBBLE_HIGH[length]
+            telegram[5] = self.NIBBLE_LOW[length]
+            pos = 6
+        telegram[pos:pos + length] = payload
+        pos += length
         if checksum:
-            chk_sum = sum(telegram[1:]) % 256
-            chk_h = 0xF0 | ((chk_sum & 0xF0) >> 4)
-            chk_l = 0xF0 | (chk_sum & 0x0F)
-            telegram.extend([chk_h, chk_l])
-        telegram.append(0x03)
+            chk_sum = sum(telegram[1:pos]) % 256
+            telegram[pos] = self.NIBBLE_HIGH[chk_sum]
+            telegram[pos + 1] = self.NIBBLE_LOW[chk_sum]
+        telegram[-1] = 0x03
         
         self._send(telegram)
         
@@ -161,8 +200,7 @@ class MigraTCP:
           The expected length of the payload (usually 1 byte for status code)
         """
         
-        telegram = bytearray()
-        telegram.extend(self._receive(5 + payload_length))
+        telegram = self._receive(5 + payload_length)
         payload = telegram[4:-1]
         return payload
     
@@ -172,17 +210,28 @@ class MigraTCP:
         """
         
         color = color.lower()
-        choices = [inner for outer in self.COLOR_NAMES.values() for inner in outer]
-        if color not in choices:
-            raise ValueError(f"Invalid color name '{color}'. Choices are: {', '.join(choices)}")
-        return [key for key, value in self.COLOR_NAMES.items() if color in value][0]
+        try:
+            return self.COLOR_FLAGS[color]
+        except KeyError:
+            raise ValueError(f"Invalid color name '{color}'. Choices are: {', '.join(self.COLOR_FLAGS)}") from None
+    
+    def _get_color_flag_ascii(self, color):
+        """
+        Same as get_color_flag, but return the flag as ASCII bytes
+        """
+        
+        try:
+            return self.COLOR_FLAGS_ASCII[color.lower()]
+        except KeyError:
+            # Raises the ValueError for invalid color names
+            return self.get_color_flag(color)
     
     def send_command(self, command, escape=True, *args, **kwargs):
         """
         Send a command (consisting of an escape character and some ASCII chars)
         
         command:
-          The command to be sent (string)
+          The command to be sent (string or ASCII bytes)
         
         escape:
           Whether to prepend an escape character (0x1B) - not needed for text
@@ -191,16 +240,17 @@ class MigraTCP:
           Passed to send_telegram
         """
         
-        payload = bytearray()
+        if isinstance(command, str):
+            command = command.encode('ascii', errors=self.encoding_errors)
+        # When queueing, the command is appended to the queue directly
+        payload = self.command_queue if self.command_queue_enabled else bytearray()
         if escape:
             payload.append(0x1B)
         if not escape and self.command_queue_enabled:
             # Separate non-escaped commands (texts) by 0x1F when queueing
             payload.append(0x1F)
-        payload.extend(command.encode('ascii', errors=self.encoding_errors))
-        if self.command_queue_enabled:
-            self.command_queue.append(payload)
-        else:
+        payload.extend(command)
+        if not self.command_queue_enabled:
             return self.send_telegram(payload, *args, **kwargs)
     
     def start_command_queue(self):
@@ -220,12 +270,33 @@ class MigraTCP:
         """
         
         try:
-            telegram = b"".join(self.command_queue)
-            response = self.send_telegram(telegram, *args, **kwargs)
+            response = self.send_telegram(self.command_queue, *args, **kwargs)
             return response
         finally:
             self.command_queue_enabled = False
-            self.command_queue = []
+            self.command_queue = bytearray()
+    
+    @contextmanager
+    def pipeline(self, *args, **kwargs):
+        """
+        Context manager wrapping start_command_queue() and send_command_queue().
+        All commands issued inside the with block are sent as one telegram
+        when the block exits. If the block raises, the queued commands are discarded.
+        The response to the telegram is not returned, use the queue functions
+        directly if it is needed.
+        
+        *args, **kwargs:
+          Passed to send_command_queue
+        """
+        
+        self.start_command_queue()
+        try:
+            yield self
+        except BaseException:
+            self.command_queue_enabled = False
+            self.command_queue = bytearray()
+            raise
+        self.send_command_queue(*args, **kwargs)
     
     def text(self, text):
         """
@@ -245,15 +316,15 @@ class MigraTCP:
           Whether to force equal character widths
         """
         
-        mono_flag = "z" if monospace else "Z"
-        return self.send_command(f"{mono_flag}{font_id:02}")
+        mono_flag = b"z" if monospace else b"Z"
+        return self.send_command(b"%b%02d" % (mono_flag, font_id))
         
     def set_cursor_pos(self, x, y):
         """
         Set the cursor to the specified X and Y coordinates
         """
         
-        return self.send_command(f"C{x:03}{y:03}")
+        return self.send_command(b"C%03d%03d" % (x, y))
         
     def set_attributes(self, fg_color, bg_color, blink):
         """
@@ -270,9 +341,9 @@ class MigraTCP:
           True for blinking text, False for static text
         """
         
-        fg_flag = self.get_color_flag(fg_color)
-        bg_flag = self.get_color_flag(bg_color)
-        return self.send_command(f"A{fg_flag}{bg_flag}{str(int(blink))}")
+        fg_flag = self._get_color_flag_ascii(fg_color)
+        bg_flag = self._get_color_flag_ascii(bg_color)
+        return self.send_command(b"A%b%b%d" % (fg_flag, bg_flag, int(blink)))
     
     def set_scroll_speed(self, speed):
         """
@@ -298,42 +369,42 @@ class MigraTCP:
         Show the stored text with the given ID
         """
         
-        return self.send_command(f"T+{text_id:03}")
+        return self.send_command(b"T+%03d" % text_id)
     
     def hide_text(self, text_id):
         """
         Hide the stored text with the given ID
         """
         
-        return self.send_command(f"T-{text_id:03}")
+        return self.send_command(b"T-%03d" % text_id)
     
     def show_image(self, image_id):
         """
         Show the stored image with the given ID
         """
         
-        return self.send_command(f"G+{image_id:03}")
+        return self.send_command(b"G+%03d" % image_id)
     
     def hide_image(self, image_id):
         """
         Hide the stored image with the given ID
         """
         
-        return self.send_command(f"G-{image_id:03}")
+        return self.send_command(b"G-%03d" % image_id)
     
     def show_variable(self, var_id):
         """
         Show the stored variable with the given ID
         """
         
-        return self.send_command(f"V+{var_id:03}")
+        return self.send_command(b"V+%03d" % var_id)
     
     def hide_variable(self, var_id):
         """
         Hide the stored variable with the given ID
         """
         
-        return self.send_command(f"V-{var_id:03}")
+        return self.send_command(b"V-%03d" % var_id)
     
     def set_variable_value(self, var_id, value):
         """
@@ -347,14 +418,14 @@ class MigraTCP:
         Increment the stored variable with the given ID
         """
         
-        return self.send_command(f"VI{var_id:03}")
+        return self.send_command(b"VI%03d" % var_id)
     
     def decrement_variable(self, var_id):
         """
         Decrement the stored variable with the given ID
         """
         
-        return self.send_command(f"VD{var_id:03}")
+        return self.send_command(b"VD%03d" % var_id)
     
     def set_variable_pos(self, var_id, x, y):
         """
@@ -362,21 +433,21 @@ class MigraTCP:
         to the given X and Y coordinates
         """
         
-        return self.send_command(f"VP{var_id:03}{x:03}{y:03}")
+        return self.send_command(b"VP%03d%03d%03d" % (var_id, x, y))
     
     def show_bargraph(self, bg_id):
         """
         Show the stored bargraph with the given ID
         """
         
-        return self.send_command(f"W+{bg_id:03}")
+        return self.send_command(b"W+%03d" % bg_id)
     
     def hide_bargraph(self, bg_id):
         """
         Hide the stored bargraph with the given ID
         """
         
-        return self.send_command(f"W-{bg_id:03}")
+        return self.send_command(b"W-%03d" % bg_id)
     
     def set_bargraph_value(self, bg_id, value):
         """
@@ -386,8 +457,8 @@ class MigraTCP:
         # Alternative command format: raw signed integer
         # f"W={bg_id:03}I{high_byte}{low_byte}"
         
-        sign = "+" if value >= 0 else "-"
-        return self.send_command(f"W={bg_id:03}A{sign}{abs(value):05}")
+        sign = b"+" if value >= 0 else b"-"
+        return self.send_command(b"W=%03dA%b%05d" % (bg_id, sign, abs(value)))
     
     def fill(self, color):
         """
@@ -397,8 +468,8 @@ class MigraTCP:
           One of self.COLORS
         """
         
-        color_flag = self.get_color_flag(color)
-        return self.send_command(f"F{color_flag}")
+        color_flag = self._get_color_flag_ascii(color)
+        return self.send_command(b"F" + color_flag)
     
     def set_pixel(self, x, y, color):
         """
@@ -408,15 +479,15 @@ class MigraTCP:
           One of self.COLORS
         """
         
-        color_flag = self.get_color_flag(color)
-        return self.send_command(f"P{color_flag}{x:03}{y:03}")
+        color_flag = self._get_color_flag_ascii(color)
+        return self.send_command(b"P%b%03d%03d" % (color_flag, x, y))
     
     def get_pixel(self, x, y):
         """
         Get the color of the given pixel
         """
         
-        response = self.send_command(f"P?{x:03}{y:03}", response_length=3)
+        response = self.send_command(b"P?%03d%03d" % (x, y), response_length=3)
         color = self.COLORS[response[2] - ord("0")]
         return color
     
@@ -437,9 +508,73 @@ class MigraTCP:
           One of self.COLORS or 'transparent'
         """
         
-        fg_flag = self.get_color_flag(fg_color)
-        bg_flag = self.get_color_flag(bg_color)
-        return self.send_command(f"R{fg_flag}{bg_flag}{x1:03}{y1:03}{x2:03}{y2:03}")
+        fg_flag = self._get_color_flag_ascii(fg_color)
+        bg_flag = self._get_color_flag_ascii(bg_color)
+        return self.send_command(b"R%b%b%03d%03d%03d%03d" % (fg_flag, bg_flag, x1, y1, x2, y2))
+    
+    def blit(self, pixels, x=0, y=0):
+        """
+        Draw a block of pixels using as few telegrams as possible.
+        Each row is split into runs of the same color, every run is drawn
+        as a one pixel high rectangle and the rectangles are sent in batches
+        as large as a telegram allows.
+        If the command queue is already enabled, the rectangles are only
+        added to the queue, which then has to hold all of them.
+        
+        pixels:
+          Sequence of rows, each row being a sequence of color names.
+          Transparent pixels are left unchanged.
+        
+        x, y:
+          Coordinates of the top left corner
+        
+        Returns:
+          A list of the responses to the sent telegrams
+          (empty if the command queue was already enabled)
+        """
+        
+        commands = []
+        for row_y, row in enumerate(pixels, y):
+            run_x = x
+            for color, run in groupby(row):
+                run_length = sum(1 for _ in run)
+                flag = self._get_color_flag_ascii(color)
+                if flag != self.COLOR_FLAGS_ASCII["transparent"]:
+                    commands.append(b"R%b%b%03d%03d%03d%03d" % (flag, flag, run_x, row_y, run_x + run_length - 1, row_y))
+                run_x += run_length
+        
+        if self.command_queue_enabled:
+            # Everything has to fit into the caller's queued telegram,
+            # check before queueing anything
+            queue_length = len(self.command_queue) + sum(len(command) + 1 for command in commands)
+            if queue_length > self.MAX_PAYLOAD_LENGTH:
+                raise ValueError(f"Command queue would be too long for one telegram ({queue_length} bytes, max. {self.MAX_PAYLOAD_LENGTH} bytes)")
+            for command in commands:
+                self.send_command(command)
+            return []
+        
+        # Split the commands into batches that fit into one telegram,
+        # each command is sent with a leading escape character
+        batches = []
+        batch = []
+        batch_length = 0
+        for command in commands:
+            if batch and batch_length + len(command) + 1 > self.MAX_PAYLOAD_LENGTH:
+                batches.append(batch)
+                batch = []
+                batch_length = 0
+            batch.append(command)
+            batch_length += len(command) + 1
+        if batch:
+            batches.append(batch)
+        
+        responses = []
+        for batch in batches:
+            self.start_command_queue()
+            for command in batch:
+                self.send_command(command)
+            responses.append(self.send_command_queue())
+        return responses
     
     def scroll_area_vertical(self, direction, speed, step, y1, y2, extended_range=False):
         """
@@ -518,17 +653,10 @@ class MigraTCP:
           A list in the same form as the outputs parameter
         """
         
-        def _get_output_flag(value):
-            if value is True:
-                return "1"
-            elif value is False:
-                return "0"
-            else:
-                return "N"
-        
-        output_flags = "".join(map(_get_output_flag, outputs))
-        response = self.send_command(f"D{output_flags}", response_length=18)
-        inputs = [(v == ord("1")) for v in response[2:]]
+        # Only True and False themselves switch an output, anything else leaves it unchanged
+        output_flags = b"".join([b"1" if value is True else b"0" if value is False else b"N" for value in outputs])
+        response = self.send_command(b"D" + output_flags, response_length=18)
+        inputs = [(v == 0x31) for v in response[2:]] # ASCII "1"
         return inputs
     
     def run_macros(self, macro_id):
@@ -536,7 +664,7 @@ class MigraTCP:
         Run macros starting at the given ID
         """
         
-        return self.send_command(f"M{macro_id:03}")
+        return self.send_command(b"M%03d" % macro_id)
     
     def run_macro_conditional(self, macro_id, input_channel, trigger_mode, trigger_state):
         """
@@ -563,7 +691,7 @@ class MigraTCP:
         """
         
         duration_flag = int(duration * 10)
-        return self.send_command(f"w{duration_flag:03}")
+        return self.send_command(b"w%03d" % duration_flag)
     
     def stop_macros(self):
         """
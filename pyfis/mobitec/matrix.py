@@ -17,6 +17,8 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import serial
 
+from contextlib import contextmanager
+
 from ..utils import debug_hex, high16, low16
 
 
@@ -57,6 +59,7 @@ class MobitecMatrix:
         self.debug = debug
         self.exclusive = exclusive
         self.encoding_errors = encoding_errors
+        self._tx_buffer = None
         self.open()
     
     def open(self):
@@ -70,43 +73,71 @@ class MobitecMatrix:
     def close(self):
         self.device.close()
     
-    def make_checksum(self, data):
-        checksum_bytes = bytearray()
-        checksum = sum(data) % 0x100
+    def _encode_checksum(self, checksum):
+        # 0xFE and 0xFF are reserved, so they are escaped
         if checksum == 0xFF:
-            checksum_bytes.append(0xFE)
-            checksum_bytes.append(0x01)
+            return bytearray((0xFE, 0x01))
         elif checksum == 0xFE:
-            checksum_bytes.append(0xFE)
-            checksum_bytes.append(0x00)
+            return bytearray((0xFE, 0x00))
         else:
-            checksum_bytes.append(checksum)
-        return checksum_bytes
+            return bytearray((checksum,))
+
+    def make_checksum(self, data):
+        return self._encode_checksum(sum(data) % 0x100)
 
     def make_command_frame(self, data):
-        frame = bytearray()
-        frame.append(0xFF)
-        frame.append(self.address)
+        frame = bytearray((0xFF, self.address))
         frame += data
-        checksum_data = bytearray([self.address]) + data
-        frame += self.make_checksum(checksum_data)
+        # The address is part of the checksum, add it separately
+        # instead of building a copy of the data with the address prepended
+        frame += self._encode_checksum((self.address + sum(data)) % 0x100)
         frame.append(0xFF)
         return frame
 
     def send_frame(self, frame):
         if self.debug:
             print("TX: " + debug_hex(frame, readable_ascii=False, readable_ctrl=False))
-        self.device.write(frame)
+        if self._tx_buffer is not None:
+            self._tx_buffer += frame
+        else:
+            self.device.write(frame)
+
+    def _flush_tx(self):
+        # Write all frames collected by batch() so far
+        if self._tx_buffer:
+            self.device.write(self._tx_buffer)
+            self.device.flush()
+            self._tx_buffer.clear()
+
+    @contextmanager
+    def batch(self):
+        """
+        Collect all frames sent inside the with block
+        and write them to the serial port in one go when the block exits.
+        If the block raises, the collected frames are discarded.
+        Nested blocks are part of the outermost batch.
+        """
+        if self._tx_buffer is not None:
+            yield self
+            return
+        self._tx_buffer = bytearray()
+        try:
+            yield self
+        except BaseException:
+            self._tx_buffer = None
+            raise
+        try:
+            self._flush_tx()
+        finally:
+            self._tx_buffer = None
 
     def make_static_text_field(self, text, x = 0, y = 0, font = None):
         """
         0xDA can be used inside the text to turn on inversion, 0xDB turns it off.
         """
-        data = []
-        data += [self.ATTR_POS_X, x]
-        data += [self.ATTR_POS_Y, y]
+        data = bytearray((self.ATTR_POS_X, x, self.ATTR_POS_Y, y))
         if font is not None:
-            data += [self.ATTR_FONT, font]
+            data += bytes((self.ATTR_FONT, font))
         data += text.encode("latin-1", errors=self.encoding_errors)
         return data
 
@@ -122,14 +153,11 @@ class MobitecMatrix:
         effect_speed:  IF effect is EFFECT_BLINK: Perios (in seconds) for blinking (i.e. 1x on + 1x off)
                        ELSE: Scroll speed in pixels per second
         """
-        data = []
-        data += [self.ATTR_SCROLL_PARAMS]
-        data += text_area
-        data += [effect, effect_cycles, effect_time, effect_speed]
-        data += [self.ATTR_POS_X, x]
-        data += [self.ATTR_POS_Y, y]
+        data = bytearray((self.ATTR_SCROLL_PARAMS,))
+        data.extend(text_area)
+        data += bytes((effect, effect_cycles, effect_time, effect_speed, self.ATTR_POS_X, x, self.ATTR_POS_Y, y))
         if font is not None:
-            data += [self.ATTR_FONT, font]
+            data += bytes((self.ATTR_FONT, font))
         data += text.encode("latin-1", errors=self.encoding_errors)
         return data
 
@@ -161,12 +189,11 @@ class MobitecMatrix:
         all the texts without a duration up to and including the next one WITH a duration
         will be shown together.
         """
-        data = [self.CMD_EFFECT_TEXT if use_effects else self.CMD_TEXT]
+        data = bytearray((self.CMD_EFFECT_TEXT if use_effects else self.CMD_TEXT,))
         if display_width is not None:
-            data += [self.ATTR_DISPLAY_WIDTH, display_width]
+            data += bytes((self.ATTR_DISPLAY_WIDTH, display_width))
         if display_height is not None:
-            data += [self.ATTR_DISPLAY_HEIGHT, display_height]
-        num_texts = len(texts)
+            data += bytes((self.ATTR_DISPLAY_HEIGHT, display_height))
 
         for text in texts:
             if use_effects:
@@ -174,9 +201,9 @@ class MobitecMatrix:
             else:
                 data += self.make_static_text_field(text['text'], text['x'], text['y'], text['font'])
             if 'duration' in text:
-                data += [0xB0, text['duration']]
+                data += bytes((0xB0, text['duration']))
 
-        frame = self.make_command_frame(bytearray(data))
+        frame = self.make_command_frame(data)
         self.send_frame(frame)
 
     def send_static_text(self, text, x = 0, y = 0, font = None, display_width = None, display_height = None):
@@ -210,4 +237,5 @@ class MobitecMatrix:
         # Causes the display to send back the specified byte for testing communication
         frame = self.make_command_frame(bytearray([self.CMD_TEST, 0x00, byte]))
         self.send_frame(frame)
+        self._flush_tx()
         return self.device.read(1)
\ No newline at end of file
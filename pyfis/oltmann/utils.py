@@ -18,6 +18,38 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import json
 import os
 
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _load_dimensions(font):
+    """
+    Load the character dimensions of the given font.
+    The result is cached, so each file is only read once.
+    """
+    
+    try:
+        with open(os.path.join(os.path.dirname(__file__), "dimensions-{}.json".format(font)), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise NotImplementedError("Width calculation not available for this font")
+
+
+@lru_cache(maxsize=None)
+def _get_width_table(font):
+    """
+    Build a bytes.translate() table mapping each Latin-1 character
+    to its width in the given font (0 for unknown characters).
+    Returns the table and the character spacing.
+    """
+    
+    dimensions = _load_dimensions(font)
+    widths = bytearray(256)
+    for char, dims in dimensions.items():
+        if len(char) == 1 and ord(char) < 256 and dims[0]:
+            widths[ord(char)] = dims[0]
+    return bytes(widths), dimensions.get('spacing', 0)
+
 
 def get_text_width(text, font):
     """
@@ -27,17 +59,8 @@ def get_text_width(text, font):
     if not text:
         return 0
     
-    try:
-        with open(os.path.join(os.path.dirname(__file__), "dimensions-{}.json".format(font)), 'r') as f:
-            dimensions = json.load(f)
-        width = 0
-        for char in text:
-            dims = dimensions.get(char, (0, 0))
-            w = dims[0]
-            if w is None:
-                w = 0
-            width += w
-        width += dimensions.get('spacing', 0) * (len(text) - 1)
-        return width
-    except FileNotFoundError:
-        raise NotImplementedError("Width calculation not available for this font")
\ No newline at end of file
+    widths, spacing = _get_width_table(font)
+    # Characters outside of Latin-1 have no width, so they can be dropped
+    width = sum(text.encode('latin-1', errors='ignore').translate(widths))
+    width += spacing * (len(text) - 1)
+    return width
\ No newline at end of file
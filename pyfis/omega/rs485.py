@@ -54,7 +54,7 @@ class OmegaRS485Controller:
 
     def send_raw_message(self, message):
         if self.debug:
-            print(" ".join((format(x, "02X") for x in message)))
+            print(bytes(message).hex(" ").upper())
         self.init_communication()
         self.port.write(message)
 
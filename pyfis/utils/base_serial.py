@@ -26,6 +26,11 @@ class BaseSerialPort:
     def read(self, length):
         raise NotImplementedError
 
+    def flush(self):
+        # Wait until all data has been written.
+        # Nothing to do for ports without a transmit buffer.
+        pass
+
     def setRTS(self, state):
         raise NotImplementedError
 
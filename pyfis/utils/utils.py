@@ -56,6 +56,9 @@ def debug_hex(message, readable_ascii = False, readable_ctrl = False):
         0x17: "ETB"
     }
 
+    if not readable_ascii and not readable_ctrl:
+        return bytes(message).hex(" ").upper()
+
     result = []
     for byte in message:
         if readable_ctrl and byte in CTRL_CHARS: